@@ -4,207 +4,118 @@ Investor-Entrepreneur Platform Chatbot
 Supports multiple integration methods for any website framework
 """
 
-from flask import Flask, request, jsonify, render_template_string
-from flask_cors import CORS
-import json
+from flask import Flask, request, render_template_string
+from flask_sock import Sock
+import orjson
+import os
 import re
 import datetime
-from typing import Dict, List, Any
-import uuid
+import functools
+import gzip
+import hashlib
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any
+import secrets
+
+# RE2, when installed, hardens intent matching on long messages: it guarantees
+# linear-time matching, where backtracking on the '.*' patterns grows quadratically
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Brotli-compressed static assets are served only when the module is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for cross-origin requests
-
-class InvestorEntrepreneurChatbot:
-    def __init__(self):
-        self.conversation_history = {}
-        self.user_profiles = {}
-        
-        # Intent patterns for different user types
-        self.intent_patterns = {
-            'investor': {
-                'seeking_startups': [
-                    r'looking for.*startup', r'investment.*opportunit', r'seed.*round',
-                    r'series.*funding', r'startup.*invest', r'due.*diligence',
-                    r'invest.*in.*startup', r'startup.*investment', r'find.*startup'
-                ],
-                'portfolio_inquiry': [
-                    r'portfolio.*track', r'investment.*performance', r'return.*investment',
-                    r'portfolio.*management'
-                ],
-                'market_analysis': [
-                    r'market.*trend', r'industry.*analysis', r'sector.*growth',
-                    r'market.*size', r'competition.*analysis'
-                ]
-            },
-            'entrepreneur': {
-                'seeking_funding': [
-                    r'need.*funding', r'raise.*capital', r'looking.*investor',
-                    r'seed.*money', r'venture.*capital', r'angel.*investor',
-                    r'seeking.*funding', r'need.*investment'
-                ],
-                'pitch_help': [
-                    r'pitch.*deck', r'business.*plan', r'present.*idea',
-                    r'pitch.*help', r'investor.*presentation'
-                ],
-                'business_advice': [
-                    r'business.*advice', r'startup.*help', r'scale.*business',
-                    r'growth.*strategy', r'business.*model'
-                ]
-            },
-            'general': {
-                'platform_info': [
-                    r'how.*platform.*work', r'what.*this.*platform', r'platform.*feature',
-                    r'how.*use.*platform'
-                ],
-                'registration': [
-                    r'sign.*up', r'register', r'create.*account', r'join.*platform'
-                ],
-                'meeting_scheduling': [
-                    r'schedule.*meeting', r'book.*appointment', r'arrange.*call',
-                    r'set.*meeting'
-                ]
-            }
-        }
-        
-        # Response templates
-        self.responses = {
-            'investor': {
-                'seeking_startups': self._get_startup_opportunities_response,
-                'portfolio_inquiry': self._get_portfolio_response,
-                'market_analysis': self._get_market_analysis_response
-            },
-            'entrepreneur': {
-                'seeking_funding': self._get_funding_opportunities_response,
-                'pitch_help': self._get_pitch_help_response,
-                'business_advice': self._get_business_advice_response
-            },
-            'general': {
-                'platform_info': self._get_platform_info_response,
-                'registration': self._get_registration_response,
-                'meeting_scheduling': self._get_meeting_scheduling_response
-            }
-        }
-
-    def identify_user_type(self, message: str, conversation_id: str) -> str:
-        """Identify if user is investor, entrepreneur, or unknown"""
-        investor_keywords = ['invest', 'portfolio', 'capital', 'funding round', 'due diligence', 'returns']
-        entrepreneur_keywords = ['startup', 'raise money', 'pitch', 'business idea', 'need funding', 'scale']
-        
-        # Check conversation history
-        if conversation_id in self.user_profiles:
-            return self.user_profiles[conversation_id].get('type', 'unknown')
-        
-        message_lower = message.lower()
-        investor_score = sum(1 for keyword in investor_keywords if keyword in message_lower)
-        entrepreneur_score = sum(1 for keyword in entrepreneur_keywords if keyword in message_lower)
-        
-        if investor_score > entrepreneur_score:
-            return 'investor'
-        elif entrepreneur_score > investor_score:
-            return 'entrepreneur'
-        else:
-            return 'unknown'
-
-    def identify_intent(self, message: str, user_type: str) -> str:
-        """Identify the intent of the user's message"""
-        message_lower = message.lower()
-        
-        # Check user type specific patterns first
-        if user_type in self.intent_patterns:
-            for intent, patterns in self.intent_patterns[user_type].items():
-                for pattern in patterns:
-                    if re.search(pattern, message_lower):
-                        return intent
-        
-        # Check general patterns
-        for intent, patterns in self.intent_patterns['general'].items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    return intent
-        
-        return 'general_inquiry'
-
-    def process_message(self, message: str, conversation_id: str = None) -> Dict[str, Any]:
-        """Main method to process incoming messages"""
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-        
-        # Initialize conversation history
-        if conversation_id not in self.conversation_history:
-            self.conversation_history[conversation_id] = []
-        
-        # Add user message to history
-        self.conversation_history[conversation_id].append({
-            'role': 'user',
-            'message': message,
-            'timestamp': datetime.datetime.now().isoformat()
-        })
-        
-        # Identify user type and intent
-        user_type = self.identify_user_type(message, conversation_id)
-        intent = self.identify_intent(message, user_type)
-        
-        # Update user profile
-        if conversation_id not in self.user_profiles:
-            self.user_profiles[conversation_id] = {}
-        self.user_profiles[conversation_id]['type'] = user_type
-        self.user_profiles[conversation_id]['last_intent'] = intent
-        
-        # Generate response
-        response = self.generate_response(user_type, intent, message, conversation_id)
-        
-        # Add bot response to history
-        self.conversation_history[conversation_id].append({
-            'role': 'bot',
-            'message': response,
-            'timestamp': datetime.datetime.now().isoformat()
-        })
-        
-        return {
-            'conversation_id': conversation_id,
-            'user_type': user_type,
-            'intent': intent,
-            'response': response,
-            'suggestions': self.get_suggestions(user_type, intent)
-        }
-
-    def generate_response(self, user_type: str, intent: str, message: str, conversation_id: str) -> str:
-        """Generate appropriate response based on user type and intent"""
-        if user_type in self.responses and intent in self.responses[user_type]:
-            return self.responses[user_type][intent](message, conversation_id)
-        elif intent in self.responses['general']:
-            return self.responses['general'][intent](message, conversation_id)
-        else:
-            return self._get_default_response(user_type, message)
-
-    def get_suggestions(self, user_type: str, intent: str) -> List[str]:
-        """Get suggested follow-up questions/actions"""
-        suggestions = {
-            'investor': [
-                "Show me startup opportunities in tech",
-                "What's the average ROI in Series A rounds?",
-                "Schedule a meeting with promising startups",
-                "Analyze market trends in fintech"
-            ],
-            'entrepreneur': [
-                "Help me prepare my pitch deck",
-                "Find investors interested in my industry",
-                "What funding stage am I ready for?",
-                "Connect me with mentors"
-            ],
-            'unknown': [
-                "I'm an investor looking for opportunities",
-                "I'm an entrepreneur seeking funding",
-                "Tell me about this platform",
-                "How do I get started?"
-            ]
-        }
-        return suggestions.get(user_type, suggestions['unknown'])
-
-    # Response methods for different intents
-    def _get_startup_opportunities_response(self, message: str, conversation_id: str) -> str:
-        return """🚀 **Startup Investment Opportunities**
+sock = Sock(app)
+
+# Per-process conversation state is bounded; evicted histories are archived here
+MAX_CONVERSATIONS = 10000
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'conversation_history_archives')
+
+# Protocol-level WebSocket pings keep idle chat connections alive through proxies
+WS_PING_INTERVAL = int(os.environ.get('CHAT_WS_PING_INTERVAL', 25))
+# Each connection may hold this many unprocessed messages, each at most this many bytes
+WS_QUEUE_SIZE = 4
+WS_MAX_MESSAGE_SIZE = 64 * 1024
+app.config['SOCK_SERVER_OPTIONS'] = {
+    'ping_interval': WS_PING_INTERVAL,
+    'max_message_size': WS_MAX_MESSAGE_SIZE
+}
+
+# Messages at least this long are matched with RE2 when it is installed; below it,
+# RE2's per-call overhead makes it slower than re
+LINEAR_MATCH_MIN_LENGTH = 1024
+
+# Distinct messages remembered by the user-type and intent classifiers
+CLASSIFY_CACHE_SIZE = 4096
+
+# A message repeated within this many seconds in the same conversation is a double send
+DEDUP_WINDOW = 5
+
+
+class LRUDict(OrderedDict):
+    """Dict holding at most ``maxsize`` entries, evicting the least recently used.
+
+    ``on_evict(key, value)`` is called for every entry pushed out.
+    """
+
+    def __init__(self, maxsize: int = MAX_CONVERSATIONS, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            evicted = self._trim()
+        self._notify_evicted(evicted)
+
+    def setdefault(self, key, default=None):
+        """Return the value for ``key``, inserting ``default`` first if it is missing.
+
+        The lookup and insert happen under one lock hold, so the returned value
+        is never lost to an eviction in between.
+        """
+        with self.lock:
+            if key in self:
+                return self[key]
+            super().__setitem__(key, default)
+            evicted = self._trim()
+        self._notify_evicted(evicted)
+        return default
+
+    def _trim(self) -> List[Tuple[Any, Any]]:
+        """Pop least recently used entries beyond ``maxsize``; call with the lock held"""
+        evicted = []
+        while len(self) > self.maxsize:
+            evicted.append(self.popitem(last=False))
+        return evicted
+
+    def _notify_evicted(self, evicted: List[Tuple[Any, Any]]):
+        if self.on_evict:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+
+# Static response templates, shared by every conversation
+_RESP_STARTUP_OPPORTUNITIES = """🚀 **Startup Investment Opportunities**
 
 I can help you discover promising startups! Here's what I can do:
 
@@ -227,8 +138,7 @@ Would you like me to:
 
 What's your investment focus and ticket size?"""
 
-    def _get_funding_opportunities_response(self, message: str, conversation_id: str) -> str:
-        return """💰 **Funding Opportunities for Entrepreneurs**
+_RESP_FUNDING_OPPORTUNITIES = """💰 **Funding Opportunities for Entrepreneurs**
 
 Great! I can help you connect with the right investors. Let me understand your startup better:
 
@@ -252,8 +162,7 @@ Great! I can help you connect with the right investors. Let me understand your s
 
 Tell me about your startup and funding needs!"""
 
-    def _get_pitch_help_response(self, message: str, conversation_id: str) -> str:
-        return """🎯 **Pitch Deck & Presentation Help**
+_RESP_PITCH_HELP = """🎯 **Pitch Deck & Presentation Help**
 
 I'll help you create a compelling pitch! Here's my framework:
 
@@ -282,8 +191,7 @@ I'll help you create a compelling pitch! Here's my framework:
 
 What specific help do you need with your pitch?"""
 
-    def _get_platform_info_response(self, message: str, conversation_id: str) -> str:
-        return """🌟 **Welcome to the Investor-Entrepreneur Platform!**
+_RESP_PLATFORM_INFO = """🌟 **Welcome to the Investor-Entrepreneur Platform!**
 
 This platform connects investors and entrepreneurs for mutual success:
 
@@ -312,8 +220,7 @@ To get started:
 
 How can I help you today?"""
 
-    def _get_registration_response(self, message: str, conversation_id: str) -> str:
-        return """📝 **Platform Registration**
+_RESP_REGISTRATION = """📝 **Platform Registration**
 
 I'd love to help you get registered! Here's what you need:
 
@@ -338,8 +245,7 @@ I can guide you through the registration process and help you optimize your prof
 
 Which role describes you best?"""
 
-    def _get_meeting_scheduling_response(self, message: str, conversation_id: str) -> str:
-        return """📅 **Meeting & Call Scheduling**
+_RESP_MEETING_SCHEDULING = """📅 **Meeting & Call Scheduling**
 
 I can help you schedule meetings with potential matches!
 
@@ -365,8 +271,7 @@ I can help you schedule meetings with potential matches!
 
 Who would you like to schedule a meeting with, and what's the purpose?"""
 
-    def _get_portfolio_response(self, message: str, conversation_id: str) -> str:
-        return """📊 **Portfolio Management & Tracking**
+_RESP_PORTFOLIO = """📊 **Portfolio Management & Tracking**
 
 I can help you manage and track your investment portfolio!
 
@@ -390,8 +295,7 @@ I can help you manage and track your investment portfolio!
 
 What specific portfolio information are you looking for?"""
 
-    def _get_market_analysis_response(self, message: str, conversation_id: str) -> str:
-        return """📊 **Market Analysis & Trends**
+_RESP_MARKET_ANALYSIS = """📊 **Market Analysis & Trends**
 
 Here's the latest market intelligence:
 
@@ -413,8 +317,7 @@ Here's the latest market intelligence:
 
 Which specific market segment or trend interests you most?"""
 
-    def _get_business_advice_response(self, message: str, conversation_id: str) -> str:
-        return """💡 **Business Advice & Strategy**
+_RESP_BUSINESS_ADVICE = """💡 **Business Advice & Strategy**
 
 I'm here to help with your business challenges!
 
@@ -441,14 +344,7 @@ I'm here to help with your business challenges!
 
 What specific business challenge are you facing? The more details you provide, the better I can help!"""
 
-    def _get_default_response(self, user_type: str, message: str) -> str:
-        user_greeting = {
-            'investor': "As an investor",
-            'entrepreneur': "As an entrepreneur", 
-            'unknown': "Welcome! Whether you're an investor or entrepreneur"
-        }.get(user_type, "Hello")
-        
-        return f"""{user_greeting}, I'm here to help you succeed on our platform!
+_RESP_DEFAULT = """{greeting}, I'm here to help you succeed on our platform!
 
 I can assist with:
 🔹 Finding relevant connections and opportunities
@@ -465,51 +361,682 @@ Could you tell me more specifically what you're looking for? For example:
 
 I'm here to help make your journey more successful!"""
 
+# The fallback reply only varies by user type, so each variant is rendered once
+_DEFAULT_RESPONSES = {
+    user_type: _RESP_DEFAULT.format(greeting=greeting)
+    for user_type, greeting in (
+        ('investor', "As an investor"),
+        ('entrepreneur', "As an entrepreneur"),
+        ('unknown', "Welcome! Whether you're an investor or entrepreneur"),
+        (None, "Hello")
+    )
+}
+
+def _format_history(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy history entries, turning their epoch timestamps into ISO strings"""
+    return [
+        {**entry, 'timestamp': datetime.datetime.fromtimestamp(entry['timestamp']).isoformat()}
+        for entry in history
+    ]
+
+# Suggested follow-ups per user type; tuples so they can be shared safely
+_SUGGESTIONS: Dict[str, Tuple[str, ...]] = {
+    'investor': (
+        "Show me startup opportunities in tech",
+        "What's the average ROI in Series A rounds?",
+        "Schedule a meeting with promising startups",
+        "Analyze market trends in fintech"
+    ),
+    'entrepreneur': (
+        "Help me prepare my pitch deck",
+        "Find investors interested in my industry",
+        "What funding stage am I ready for?",
+        "Connect me with mentors"
+    ),
+    'unknown': (
+        "I'm an investor looking for opportunities",
+        "I'm an entrepreneur seeking funding",
+        "Tell me about this platform",
+        "How do I get started?"
+    )
+}
+
+# The suggestion lists are fixed, so their JSON encoding is computed once
+_SUGGESTIONS_JSON: Dict[Tuple[str, ...], bytes] = {
+    suggestions: orjson.dumps(suggestions) for suggestions in _SUGGESTIONS.values()
+}
+
+class InvestorEntrepreneurChatbot:
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS):
+        self.conversation_history = LRUDict(max_conversations, on_evict=self._archive_conversation)
+        self.user_profiles = LRUDict(max_conversations)
+        # History versions come from one process-wide counter, so a conversation
+        # evicted and started again never repeats a version a client has cached
+        self._versions = LRUDict(max_conversations)
+        self._version_counter = itertools.count(1)
+        # Latest (message digest, time, result) per conversation, for double sends
+        self._recent_turns = LRUDict(max_conversations)
+        self._archive_lock = threading.Lock()
+        self._archive_month = None
+        self._archive_file = None
+        
+        # Intent patterns for different user types
+        self.intent_patterns = {
+            'investor': {
+                'seeking_startups': [
+                    r'looking for.*startup', r'investment.*opportunit', r'seed.*round',
+                    r'series.*funding', r'startup.*invest', r'due.*diligence',
+                    r'invest.*in.*startup', r'startup.*investment', r'find.*startup'
+                ],
+                'portfolio_inquiry': [
+                    r'portfolio.*track', r'investment.*performance', r'return.*investment',
+                    r'portfolio.*management'
+                ],
+                'market_analysis': [
+                    r'market.*trend', r'industry.*analysis', r'sector.*growth',
+                    r'market.*size', r'competition.*analysis'
+                ]
+            },
+            'entrepreneur': {
+                'seeking_funding': [
+                    r'need.*funding', r'raise.*capital', r'looking.*investor',
+                    r'seed.*money', r'venture.*capital', r'angel.*investor',
+                    r'seeking.*funding', r'need.*investment'
+                ],
+                'pitch_help': [
+                    r'pitch.*deck', r'business.*plan', r'present.*idea',
+                    r'pitch.*help', r'investor.*presentation'
+                ],
+                'business_advice': [
+                    r'business.*advice', r'startup.*help', r'scale.*business',
+                    r'growth.*strategy', r'business.*model'
+                ]
+            },
+            'general': {
+                'platform_info': [
+                    r'how.*platform.*work', r'what.*this.*platform', r'platform.*feature',
+                    r'how.*use.*platform'
+                ],
+                'registration': [
+                    r'sign.*up', r'register', r'create.*account', r'join.*platform'
+                ],
+                'meeting_scheduling': [
+                    r'schedule.*meeting', r'book.*appointment', r'arrange.*call',
+                    r'set.*meeting'
+                ]
+            }
+        }
+        
+        # Precompiled (pattern, intent) pairs per user type, in priority order
+        self._intent_matchers = self._build_matchers(re)
+        self._linear_intent_matchers = self._build_matchers(re2) if re2 else None
+        
+        # Keyword alternations used to score the user type
+        investor_keywords = ['invest', 'portfolio', 'capital', 'funding round', 'due diligence', 'returns']
+        entrepreneur_keywords = ['startup', 'raise money', 'pitch', 'business idea', 'need funding', 'scale']
+        self._investor_re = re.compile('|'.join(map(re.escape, investor_keywords)), re.IGNORECASE)
+        self._entrepreneur_re = re.compile('|'.join(map(re.escape, entrepreneur_keywords)), re.IGNORECASE)
+        
+        # Canned suggestions are resent verbatim, so classification is memoized
+        self._classify_user_type = functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._score_user_type)
+        self._classify_intent = functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._match_intent)
+        
+        # Response templates
+        self.responses = {
+            'investor': {
+                'seeking_startups': _RESP_STARTUP_OPPORTUNITIES,
+                'portfolio_inquiry': _RESP_PORTFOLIO,
+                'market_analysis': _RESP_MARKET_ANALYSIS
+            },
+            'entrepreneur': {
+                'seeking_funding': _RESP_FUNDING_OPPORTUNITIES,
+                'pitch_help': _RESP_PITCH_HELP,
+                'business_advice': _RESP_BUSINESS_ADVICE
+            },
+            'general': {
+                'platform_info': _RESP_PLATFORM_INFO,
+                'registration': _RESP_REGISTRATION,
+                'meeting_scheduling': _RESP_MEETING_SCHEDULING
+            }
+        }
+        
+        # Flat (user_type, intent) table so dispatch is a single lookup
+        self._response_table = {
+            (user_type, intent): entry
+            for user_type, entries in self.responses.items()
+            for intent, entry in entries.items()
+        }
+
+    def get_history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Get a conversation's history with ISO-formatted timestamps"""
+        return _format_history(self.conversation_history.get(conversation_id, []))
+
+    def get_history_version(self, conversation_id: str) -> int:
+        """Get a version number that changes whenever the history grows"""
+        return self._versions.get(conversation_id, 0)
+
+    def prepare(self, conversation_id: str):
+        """Mark a conversation as active ahead of its next message.
+
+        Its history, profile and version move to the recently used end of
+        their stores, so a returning client's state is not evicted before the
+        first turn arrives.
+        """
+        for store in (self.conversation_history, self.user_profiles, self._versions):
+            with store.lock:
+                if conversation_id in store:
+                    store.move_to_end(conversation_id)
+
+    def _archive_conversation(self, conversation_id: str, history: List[Dict[str, Any]]):
+        """Append an evicted conversation to this month's JSONL archive"""
+        month = datetime.date.today().strftime('%Y-%m')
+        record = orjson.dumps(
+            {'conversation_id': conversation_id, 'history': _format_history(history)}
+        ).decode('utf-8')
+        with self._archive_lock:
+            if month != self._archive_month:
+                if self._archive_file:
+                    self._archive_file.close()
+                os.makedirs(ARCHIVE_DIR, exist_ok=True)
+                self._archive_file = open(os.path.join(ARCHIVE_DIR, f'{month}.jsonl'), 'a', encoding='utf-8')
+                self._archive_month = month
+            self._archive_file.write(record + '\n')
+            self._archive_file.flush()
+
+    def _build_matchers(self, engine) -> Dict[str, List[Tuple[Any, str]]]:
+        """Compile every user type's patterns with ``engine`` (re or re2).
+
+        The general patterns are appended to each user type's list, so one loop
+        covers both in priority order.
+        """
+        general_matchers = self._compile_patterns(self.intent_patterns['general'], engine)
+        matchers = {
+            user_type: self._compile_patterns(intents, engine) + general_matchers
+            for user_type, intents in self.intent_patterns.items()
+            if user_type != 'general'
+        }
+        matchers['general'] = general_matchers
+        return matchers
+
+    def _compile_patterns(self, intents: Dict[str, List[str]], engine) -> List[Tuple[Any, str]]:
+        """Compile intent patterns into (pattern, intent) pairs, keeping their order"""
+        # Case-sensitive: messages are lowercased once before matching
+        return [
+            (engine.compile(pattern), intent)
+            for intent, patterns in intents.items()
+            for pattern in patterns
+        ]
+
+    def identify_user_type(self, message: str) -> str:
+        """Identify if user is investor, entrepreneur, or unknown"""
+        return self._classify_user_type(message)
+
+    def identify_intent(self, message: str, user_type: str) -> str:
+        """Identify the intent of the user's message"""
+        return self._classify_intent(message.lower(), user_type)
+
+    def _score_user_type(self, message: str) -> str:
+        """Classify a message by keyword score; memoized per instance"""
+        # Each distinct keyword counts once, however often it appears
+        investor_score = len({kw.lower() for kw in self._investor_re.findall(message)})
+        entrepreneur_score = len({kw.lower() for kw in self._entrepreneur_re.findall(message)})
+        
+        if investor_score > entrepreneur_score:
+            return 'investor'
+        elif entrepreneur_score > investor_score:
+            return 'entrepreneur'
+        else:
+            return 'unknown'
+
+    def _match_intent(self, message_lower: str, user_type: str) -> str:
+        """Search the precompiled intent patterns; memoized per instance"""
+        # User type patterns take precedence, then the general ones
+        intent_matchers = self._intent_matchers
+        if self._linear_intent_matchers and len(message_lower) >= LINEAR_MATCH_MIN_LENGTH:
+            intent_matchers = self._linear_intent_matchers
+        matchers = intent_matchers.get(user_type, intent_matchers['general'])
+        for pattern, intent in matchers:
+            if pattern.search(message_lower):
+                return intent
+        return 'general_inquiry'
+
+    def process_message(self, message: str, conversation_id: str = None) -> Dict[str, Any]:
+        """Main method to process incoming messages"""
+        if not conversation_id:
+            conversation_id = secrets.token_urlsafe(16)
+        
+        # One timestamp covers the whole turn; it is formatted only when history is read
+        now = time.time()
+        
+        # Resending the previous turn's message (retries, repeated clicks) gets the
+        # same reply and is recorded once
+        digest = hashlib.blake2b(message.encode('utf-8'), digest_size=16).digest()
+        last_turn = self._recent_turns.get(conversation_id)
+        if last_turn and last_turn[0] == digest and now - last_turn[1] < DEDUP_WINDOW:
+            return last_turn[2]
+        
+        user_entry = {'role': 'user', 'message': message, 'timestamp': now}
+        
+        # Identify user type and intent; a type settled for this conversation skips
+        # keyword scoring, while 'unknown' is rescored
+        profile = self.user_profiles.get(conversation_id)
+        if profile and profile.get('type', 'unknown') != 'unknown':
+            user_type = profile['type']
+        else:
+            user_type = self.identify_user_type(message)
+        intent = self.identify_intent(message, user_type)
+        
+        # Update user profile
+        self.user_profiles.setdefault(conversation_id, {}).update(type=user_type, last_intent=intent)
+        
+        # Generate response
+        response = self.generate_response(user_type, intent, message, conversation_id)
+        
+        # Record the user message and bot response together
+        self.conversation_history.setdefault(conversation_id, []).extend((
+            user_entry,
+            {'role': 'bot', 'message': response, 'timestamp': now}
+        ))
+        self._versions[conversation_id] = next(self._version_counter)
+        
+        result = {
+            'conversation_id': conversation_id,
+            'user_type': user_type,
+            'intent': intent,
+            'response': response,
+            'suggestions': self.get_suggestions(user_type, intent)
+        }
+        self._recent_turns[conversation_id] = (digest, now, result)
+        return result
+
+    def generate_response(self, user_type: str, intent: str, message: str, conversation_id: str) -> str:
+        """Generate appropriate response based on user type and intent"""
+        entry = self._response_table.get((user_type, intent)) or self._response_table.get(('general', intent))
+        if entry is None:
+            return self._get_default_response(user_type, message)
+        
+        # Static templates are stored directly; callables build dynamic replies
+        if isinstance(entry, str):
+            return entry
+        return entry(message, conversation_id)
+
+    def get_suggestions(self, user_type: str, intent: str) -> Tuple[str, ...]:
+        """Get suggested follow-up questions/actions"""
+        return _SUGGESTIONS.get(user_type, _SUGGESTIONS['unknown'])
+
+    def _get_default_response(self, user_type: str, message: str) -> str:
+        return _DEFAULT_RESPONSES.get(user_type) or _DEFAULT_RESPONSES[None]
+
 # Initialize the chatbot
 chatbot = InvestorEntrepreneurChatbot()
 
+# Cross-origin access: every endpoint is public, so a fixed header set suffices
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+@app.before_request
+def cors_preflight():
+    """Answer CORS preflight requests without dispatching to the view"""
+    if request.method == 'OPTIONS':
+        return app.response_class(status=204)
+
+@app.after_request
+def add_cors_headers(response):
+    """Enable CORS for cross-origin requests"""
+    response.headers.update(CORS_HEADERS)
+    return response
+
+# JSON bodies above this size are gzip-compressed for clients that accept it
+GZIP_MIN_SIZE = 256
+
+def accepts_gzip() -> bool:
+    """Check whether the current request accepts gzip-encoded responses"""
+    # Parsed q-values, so an explicit 'gzip;q=0' refusal is honoured
+    return request.accept_encodings['gzip'] > 0
+
+def json_bytes_response(body: bytes, status: int = 200):
+    """Wrap encoded JSON in a response, gzip-compressing large bodies"""
+    response = app.response_class(status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) > GZIP_MIN_SIZE and accepts_gzip():
+        # Level 1 keeps compression latency negligible on the request path
+        body = gzip.compress(body, 1)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_data(body)
+    return response
+
+def json_response(payload: Any, status: int = 200):
+    """Serialize a payload with orjson into a JSON response"""
+    return json_bytes_response(orjson.dumps(payload), status)
+
+def encode_chat_response(response: Dict[str, Any]) -> bytes:
+    """Encode a process_message() result, splicing in pre-encoded suggestions"""
+    suggestions = response['suggestions']
+    suggestions_json = _SUGGESTIONS_JSON.get(suggestions) or orjson.dumps(suggestions)
+    head = orjson.dumps({
+        'conversation_id': response['conversation_id'],
+        'user_type': response['user_type'],
+        'intent': response['intent'],
+        'response': response['response']
+    })
+    return head[:-1] + b',"suggestions":' + suggestions_json + b'}'
+
 # REST API Endpoints
 @app.route('/api/chat', methods=['POST'])
 def chat_api():
     """REST API endpoint for chat integration"""
     try:
-        data = request.json
+        data = orjson.loads(request.get_data(cache=False))
         message = data.get('message', '')
         conversation_id = data.get('conversation_id')
         
         if not message:
-            return jsonify({'error': 'Message is required'}), 400
+            return json_response({'error': 'Message is required'}, 400)
         
         response = chatbot.process_message(message, conversation_id)
-        return jsonify(response)
+        return json_bytes_response(encode_chat_response(response))
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
+
+# History versions restart with each process and repeat across instances, so
+# conversation ETags also carry a token unique to this process
+_ETAG_TOKEN = secrets.token_hex(4)
 
 @app.route('/api/conversation/<conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     """Get conversation history"""
-    history = chatbot.conversation_history.get(conversation_id, [])
-    return jsonify({'conversation_id': conversation_id, 'history': history})
+    # Unchanged histories are answered with 304 before any serialization
+    etag = f'{_ETAG_TOKEN}-{chatbot.get_history_version(conversation_id)}'
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        history = chatbot.get_history(conversation_id)
+        response = json_response({'conversation_id': conversation_id, 'history': history})
+    # Weak, since the gzip and identity encodings share one version
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.datetime.now().isoformat()})
+    return json_response({'status': 'healthy', 'timestamp': datetime.datetime.now().isoformat()})
+
+# WebSocket Endpoint
+# Streamed replies are sent a paragraph at a time
+_CHUNK_BOUNDARY_RE = re.compile(r'(?<=\n\n)')
+
+def handle_socket_event(raw: str, send) -> None:
+    """Process one client event and send its reply"""
+    try:
+        event = orjson.loads(raw)
+        event_type = event.get('type')
+        if event_type == 'ping':
+            # Application-level keepalive, lets clients measure round trips
+            send('{"type":"pong"}')
+            return
+        if event_type == 'warmup':
+            # Prepares state for the coming turn without sending anything back
+            chatbot.prepare(event.get('conversation_id'))
+            return
+        if event_type != 'user_message':
+            raise ValueError(f"Unknown event type: {event_type}")
+        message = event.get('message', '')
+        if not message:
+            raise ValueError('Message is required')
+        
+        response = chatbot.process_message(message, event.get('conversation_id'))
+        if event.get('stream'):
+            # Push the reply as it is produced, then close the turn with its metadata
+            for delta in _CHUNK_BOUNDARY_RE.split(response['response']):
+                send(orjson.dumps({'type': 'chunk', 'delta': delta}).decode('utf-8'))
+            reply = orjson.dumps({
+                'type': 'done',
+                'conversation_id': response['conversation_id'],
+                'user_type': response['user_type'],
+                'intent': response['intent'],
+                'suggestions': response['suggestions']
+            })
+        else:
+            reply = b'{"type":"bot_response",' + encode_chat_response(response)[1:]
+    except Exception as e:
+        reply = orjson.dumps({'type': 'error', 'error': str(e)})
+    send(reply.decode('utf-8'))
+
+def _read_socket(ws, pending: queue.Queue, send) -> None:
+    """Drain a connection into its bounded queue, refusing messages once it is full"""
+    try:
+        while True:
+            raw = ws.receive()
+            try:
+                pending.put_nowait(raw)
+            except queue.Full:
+                send('{"type":"error","error":"Too many pending messages"}')
+    except Exception:
+        pass
+    finally:
+        # Tell the handler the connection is gone once it has room
+        pending.put(None)
+
+@sock.route('/ws/chat')
+def chat_socket(ws):
+    """Persistent chat connection: one JSON event per turn in each direction"""
+    # A reader thread keeps the socket drained while turns are processed here; the
+    # bounded queue stops a client that sends faster than it is answered from
+    # piling up work and memory on the server
+    pending = queue.Queue(maxsize=WS_QUEUE_SIZE)
+    send_lock = threading.Lock()
+    
+    def send(data):
+        with send_lock:
+            ws.send(data)
+    
+    threading.Thread(target=_read_socket, args=(ws, pending, send), daemon=True).start()
+    try:
+        while True:
+            raw = pending.get()
+            if raw is None:
+                return
+            handle_socket_event(raw, send)
+    finally:
+        # Unblock the reader if the handler stops first
+        while not pending.empty():
+            pending.get_nowait()
 
 # JavaScript Widget Endpoint
-@app.route('/widget.js')
-def chat_widget():
-    """JavaScript widget for easy embedding"""
-    widget_js = """
+WIDGET_JS = """
 (function() {
     // Chatbot Widget for Investor-Entrepreneur Platform
+    // The widget runs on other sites, so the chat server is where this script came from
+    const serverOrigin = document.currentScript ?
+        new URL(document.currentScript.src).origin : window.location.origin;
+    
     let chatbotConfig = {
-        apiUrl: window.location.origin + '/api/chat',
+        apiUrl: serverOrigin + '/api/chat',
+        socketUrl: serverOrigin.replace(/^http/, 'ws') + '/ws/chat',
+        pingInterval: 25000,
+        pongTimeout: 10000,
+        maxReconnectDelay: 30000,
+        maxFailedConnects: 3,
+        idleTimeout: 120000,
+        historyLimit: 50,
         position: 'bottom-right',
         theme: 'modern'
     };
     
+    // Persistent connection for chat turns; /api/chat is the fallback. It is opened
+    // only once the chat is used and closed again when idle, since every open
+    // socket holds a server thread
+    let socket = null;
+    let connecting = false;
+    let reconnectDelay = 1000;
+    let idleTimer = null;
+    // Attempts in a row that never opened; past the limit the widget stays on HTTP
+    let failedConnects = 0;
+    
+    // Turn state: whether a reply is pending, and the socket it was sent on
+    let inflight = false;
+    let pendingSocket = null;
+    
+    // Collapse bursts (held Enter, double clicks) into one trailing call
+    function debounce(fn, delay) {
+        let timer;
+        return (...args) => {
+            clearTimeout(timer);
+            timer = setTimeout(() => fn(...args), delay);
+        };
+    }
+    
+    const debouncedSend = debounce(sendMessage, 150);
+    
+    // Transcript cache in IndexedDB: writes are buffered and flushed in batches
+    // so storage never blocks the main thread on every message
+    const transcript = {
+        db: null,
+        buffer: [],
+        timer: null,
+        
+        open() {
+            return new Promise((resolve) => {
+                if (!('indexedDB' in window)) return resolve(null);
+                const request = indexedDB.open('ie-chatbot', 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore('messages', { keyPath: 'id', autoIncrement: true });
+                    store.createIndex('convId', 'convId');
+                };
+                request.onsuccess = () => resolve(this.db = request.result);
+                request.onerror = () => resolve(null);
+            });
+        },
+        
+        save(convId, sender, message) {
+            this.buffer.push({ convId: convId, sender: sender, message: message, ts: Date.now() });
+            if (this.buffer.length >= 20) {
+                this.flush();
+            } else if (!this.timer) {
+                this.timer = setTimeout(() => this.flush(), 250);
+            }
+        },
+        
+        flush() {
+            clearTimeout(this.timer);
+            this.timer = null;
+            if (!this.db || this.buffer.length === 0) return;
+            const store = this.db.transaction('messages', 'readwrite').objectStore('messages');
+            this.buffer.forEach(entry => store.put(entry));
+            this.buffer = [];
+        },
+        
+        load(convId, limit) {
+            return new Promise((resolve) => {
+                if (!this.db) return resolve([]);
+                const rows = [];
+                const index = this.db.transaction('messages').objectStore('messages').index('convId');
+                const request = index.openCursor(IDBKeyRange.only(convId), 'prev');
+                request.onsuccess = () => {
+                    const cursor = request.result;
+                    if (cursor && rows.length < limit) {
+                        rows.push(cursor.value);
+                        cursor.continue();
+                    } else {
+                        resolve(rows.reverse());
+                    }
+                };
+                request.onerror = () => resolve([]);
+            });
+        }
+    };
+    
+    // Message of the pending turn, saved together with its reply
+    let pendingMessage = null;
+    
+    // Placeholder bubble the pending reply is written into
+    let replyBubble = null;
+    
+    function ensureSocket() {
+        if (!socket && !connecting && failedConnects < chatbotConfig.maxFailedConnects) {
+            connectSocket();
+        }
+        touchSocket();
+    }
+    
+    // Restart the idle countdown; when it runs out the socket is closed for good
+    // until the chat is used again
+    function touchSocket() {
+        clearTimeout(idleTimer);
+        idleTimer = setTimeout(() => {
+            if (inflight) return touchSocket();
+            idleTimer = null;
+            if (socket) socket.close();
+        }, chatbotConfig.idleTimeout);
+    }
+    
+    function connectSocket() {
+        if (!('WebSocket' in window)) return;
+        
+        connecting = true;
+        const ws = new WebSocket(chatbotConfig.socketUrl);
+        let pingTimer = null;
+        let pongTimer = null;
+        let pingSentAt = 0;
+        
+        ws.onopen = () => {
+            connecting = false;
+            socket = ws;
+            reconnectDelay = 1000;
+            failedConnects = 0;
+            touchSocket();
+            
+            // Let the server ready a resumed conversation while the user types
+            const conversationId = localStorage.getItem('ie-conversation-id');
+            if (conversationId) {
+                ws.send(JSON.stringify({ type: 'warmup', conversation_id: conversationId }));
+            }
+            
+            // Keep idle proxies from dropping the connection; a missing pong
+            // means the path is dead, and closing it triggers a reconnect
+            pingTimer = setInterval(() => {
+                pingSentAt = Date.now();
+                ws.send('{"type":"ping"}');
+                pongTimer = setTimeout(() => ws.close(), chatbotConfig.pongTimeout);
+            }, chatbotConfig.pingInterval);
+        };
+        ws.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.type === 'pong') {
+                clearTimeout(pongTimer);
+                console.debug('Chatbot socket round trip:', Date.now() - pingSentAt, 'ms');
+                return;
+            }
+            touchSocket();
+            if (data.type === 'bot_response') {
+                handleResponse(data);
+            } else if (data.type === 'error') {
+                handleError(data.error);
+            }
+        };
+        ws.onclose = () => {
+            clearInterval(pingTimer);
+            clearTimeout(pongTimer);
+            connecting = false;
+            if (socket === ws) {
+                socket = null;
+            } else if (++failedConnects >= chatbotConfig.maxFailedConnects) {
+                // The server never accepted a connection; stop retrying
+                return;
+            }
+            if (pendingSocket === ws) handleError(new Error('Chat connection closed'));
+            
+            // Reconnect with exponential backoff, unless the socket was closed for being idle
+            if (!idleTimer) return;
+            setTimeout(ensureSocket, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, chatbotConfig.maxReconnectDelay);
+        };
+    }
+    
     function createChatWidget() {
         // Create chat button
         const chatButton = document.createElement('div');
@@ -589,12 +1116,21 @@ def chat_widget():
         document.body.appendChild(chatButton);
         document.body.appendChild(chatWindow);
         
-        // Add initial welcome message
+        // Add initial welcome message, then restore the recent transcript
         addMessage('bot', 'Welcome! I can help investors find opportunities and entrepreneurs secure funding. Are you an investor or entrepreneur?');
         
+        const savedConversationId = localStorage.getItem('ie-conversation-id');
+        transcript.open().then(() => {
+            if (!savedConversationId) return;
+            return transcript.load(savedConversationId, chatbotConfig.historyLimit)
+                .then(rows => rows.forEach(row => addMessage(row.sender, row.message)));
+        });
+        window.addEventListener('pagehide', () => transcript.flush());
+        
         // Event listeners
         chatButton.addEventListener('click', () => {
             chatWindow.style.display = chatWindow.style.display === 'none' ? 'flex' : 'none';
+            if (chatWindow.style.display === 'flex') ensureSocket();
         });
         
         document.getElementById('ie-close-chat').addEventListener('click', () => {
@@ -604,9 +1140,9 @@ def chat_widget():
         const input = document.getElementById('ie-chat-input');
         const sendButton = document.getElementById('ie-send-button');
         
-        sendButton.addEventListener('click', sendMessage);
+        sendButton.addEventListener('click', debouncedSend);
         input.addEventListener('keypress', (e) => {
-            if (e.key === 'Enter') sendMessage();
+            if (e.key === 'Enter') debouncedSend();
         });
         
         // Hover effect
@@ -643,23 +1179,46 @@ def chat_widget():
             line-height: 1.4;
         `;
         
-        messageBubble.innerHTML = message;
+        // Rendered as text: messages are never parsed as HTML
+        messageBubble.textContent = message;
         messageDiv.appendChild(messageBubble);
         messagesDiv.appendChild(messageDiv);
+        
+        // Only the most recent window of messages stays in the DOM
+        while (messagesDiv.children.length > chatbotConfig.historyLimit) {
+            messagesDiv.removeChild(messagesDiv.firstChild);
+        }
         messagesDiv.scrollTop = messagesDiv.scrollHeight;
+        return messageBubble;
     }
     
     function sendMessage() {
         const input = document.getElementById('ie-chat-input');
         const message = input.value.trim();
         
-        if (!message) return;
+        // Drop submissions while a reply is still pending
+        if (!message || inflight) return;
+        ensureSocket();
         
         addMessage('user', message);
         input.value = '';
         
-        // Show typing indicator
-        addMessage('bot', '💭 Thinking...');
+        // Show typing indicator; the reply later replaces its text in place
+        replyBubble = addMessage('bot', '💭 Thinking...');
+        inflight = true;
+        pendingMessage = message;
+        
+        const conversationId = localStorage.getItem('ie-conversation-id');
+        
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            pendingSocket = socket;
+            socket.send(JSON.stringify({
+                type: 'user_message',
+                message: message,
+                conversation_id: conversationId
+            }));
+            return;
+        }
         
         fetch(chatbotConfig.apiUrl, {
             method: 'POST',
@@ -668,72 +1227,84 @@ def chat_widget():
             },
             body: JSON.stringify({
                 message: message,
-                conversation_id: localStorage.getItem('ie-conversation-id')
+                conversation_id: conversationId
             })
         })
         .then(response => response.json())
-        .then(data => {
-            // Remove typing indicator
-            const messages = document.getElementById('ie-chat-messages');
-            messages.removeChild(messages.lastChild);
-            
-            // Store conversation ID
-            localStorage.setItem('ie-conversation-id', data.conversation_id);
-            
-            // Add bot response
-            addMessage('bot', data.response);
+        .then(handleResponse)
+        .catch(handleError);
+    }
+    
+    function handleResponse(data) {
+        inflight = false;
+        pendingSocket = null;
+        
+        const messages = document.getElementById('ie-chat-messages');
+        const bubble = replyBubble;
+        replyBubble = null;
+        
+        // Swap the typing indicator's text for the bot response
+        const reply = data.response;
+        bubble.textContent = reply;
+
+        // Store conversation ID and persist the turn
+        localStorage.setItem('ie-conversation-id', data.conversation_id);
+        transcript.save(data.conversation_id, 'user', pendingMessage);
+        transcript.save(data.conversation_id, 'bot', reply);
+        
+        // Add suggestions if available
+        if (data.suggestions && data.suggestions.length > 0) {
+            const suggestionsDiv = document.createElement('div');
+            suggestionsDiv.style.cssText = 'margin-top: 10px;';
             
-            // Add suggestions if available
-            if (data.suggestions && data.suggestions.length > 0) {
-                const suggestionsDiv = document.createElement('div');
-                suggestionsDiv.style.cssText = 'margin-top: 10px;';
+            data.suggestions.slice(0, 3).forEach(suggestion => {
+                const suggestionBtn = document.createElement('button');
+                suggestionBtn.textContent = suggestion;
+                suggestionBtn.style.cssText = `
+                    display: block;
+                    width: 100%;
+                    margin: 5px 0;
+                    padding: 8px 12px;
+                    background: #f8f9fa;
+                    border: 1px solid #e1e8ed;
+                    border-radius: 15px;
+                    cursor: pointer;
+                    text-align: left;
+                    font-size: 13px;
+                    transition: background 0.2s;
+                `;
                 
-                data.suggestions.slice(0, 3).forEach(suggestion => {
-                    const suggestionBtn = document.createElement('button');
-                    suggestionBtn.textContent = suggestion;
-                    suggestionBtn.style.cssText = `
-                        display: block;
-                        width: 100%;
-                        margin: 5px 0;
-                        padding: 8px 12px;
-                        background: #f8f9fa;
-                        border: 1px solid #e1e8ed;
-                        border-radius: 15px;
-                        cursor: pointer;
-                        text-align: left;
-                        font-size: 13px;
-                        transition: background 0.2s;
-                    `;
-                    
-                    suggestionBtn.addEventListener('mouseenter', () => {
-                        suggestionBtn.style.background = '#e9ecef';
-                    });
-                    
-                    suggestionBtn.addEventListener('mouseleave', () => {
-                        suggestionBtn.style.background = '#f8f9fa';
-                    });
-                    
-                    suggestionBtn.addEventListener('click', () => {
-                        document.getElementById('ie-chat-input').value = suggestion;
-                        sendMessage();
-                    });
-                    
-                    suggestionsDiv.appendChild(suggestionBtn);
+                suggestionBtn.addEventListener('mouseenter', () => {
+                    suggestionBtn.style.background = '#e9ecef';
                 });
                 
-                const messages = document.getElementById('ie-chat-messages');
-                const lastMessage = messages.lastChild.querySelector('div');
-                lastMessage.appendChild(suggestionsDiv);
-            }
-        })
-        .catch(error => {
-            // Remove typing indicator
-            const messages = document.getElementById('ie-chat-messages');
-            messages.removeChild(messages.lastChild);
+                suggestionBtn.addEventListener('mouseleave', () => {
+                    suggestionBtn.style.background = '#f8f9fa';
+                });
+                
+                suggestionBtn.addEventListener('click', () => {
+                    document.getElementById('ie-chat-input').value = suggestion;
+                    sendMessage();
+                });
+                
+                suggestionsDiv.appendChild(suggestionBtn);
+            });
             
-            addMessage('bot', 'Sorry, I encountered an error. Please try again.');
-            console.error('Chatbot error:', error);
-        });
+            bubble.appendChild(suggestionsDiv);
+        }
+        messages.scrollTop = messages.scrollHeight;
+    }
+    
+    function handleError(error) {
+        inflight = false;
+        pendingSocket = null;
+        
+        // Replace the typing indicator with the error
+        if (replyBubble) {
+            replyBubble.textContent = 'Sorry, I encountered an error. Please try again.';
+            replyBubble = null;
+        }
+        console.error('Chatbot error:', error);
     }
     
     // Initialize widget when DOM is ready
@@ -744,13 +1315,59 @@ def chat_widget():
     }
 })();
 """
-    return widget_js, 200, {'Content-Type': 'application/javascript'}
+
+# Widget and iframe assets never change at runtime, so encode and compress them once
+def compress_asset(text: str) -> Dict[str, Tuple[bytes, str]]:
+    """Encode an asset and precompute its compressed variants, best encoding first.
+
+    Each variant carries a strong ETag derived from the content hash and its
+    encoding, so a changed asset or a different encoding never revalidates.
+    """
+    raw = text.encode('utf-8')
+    digest = hashlib.sha1(raw).hexdigest()
+    variants = {}
+    if brotli is not None:
+        variants['br'] = (brotli.compress(raw, quality=11), f'{digest}-br')
+    variants['gzip'] = (gzip.compress(raw, 9), f'{digest}-gzip')
+    variants['identity'] = (raw, digest)
+    return variants
+
+_WIDGET_VARIANTS = compress_asset(WIDGET_JS)
+
+def static_asset_response(variants: Dict[str, Tuple[bytes, str]], content_type: str):
+    """Serve a precomputed asset in the best encoding the client accepts"""
+    accepted = request.accept_encodings
+    encoding = next(e for e in variants if e == 'identity' or accepted[e])
+    body, etag = variants[encoding]
+    
+    # Revalidations of an unchanged asset are answered without a body
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, content_type=content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Load balancers pin a visitor's WebSocket and HTTP fallback to one instance by this cookie
+AFFINITY_COOKIE = 'chatsid'
+
+def set_affinity_cookie(response):
+    """Give first-time visitors a routing key for sticky sessions"""
+    if AFFINITY_COOKIE not in request.cookies:
+        response.set_cookie(AFFINITY_COOKIE, secrets.token_urlsafe(16), httponly=True, samesite='Lax')
+    return response
+
+@app.route('/widget.js')
+def chat_widget():
+    """JavaScript widget for easy embedding"""
+    return static_asset_response(_WIDGET_VARIANTS, 'application/javascript; charset=utf-8')
 
 # Iframe Integration
-@app.route('/chat-iframe')
-def chat_iframe():
-    """Standalone chat interface for iframe embedding"""
-    html = """
+CHAT_IFRAME_HTML = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -843,6 +1460,87 @@ def chat_iframe():
 
     <script>
         let conversationId = localStorage.getItem('chat-conversation-id');
+        const HISTORY_LIMIT = 50;
+        
+        // Transcript cache in IndexedDB: writes are buffered and flushed in batches
+        // so storage never blocks the main thread on every message
+        const transcript = {
+            db: null,
+            buffer: [],
+            timer: null,
+            
+            open: function() {
+                const self = this;
+                return new Promise(function(resolve) {
+                    if (!('indexedDB' in window)) return resolve(null);
+                    const request = indexedDB.open('chat-iframe', 1);
+                    request.onupgradeneeded = function() {
+                        const store = request.result.createObjectStore('messages', { keyPath: 'id', autoIncrement: true });
+                        store.createIndex('convId', 'convId');
+                    };
+                    request.onsuccess = function() { resolve(self.db = request.result); };
+                    request.onerror = function() { resolve(null); };
+                });
+            },
+            
+            save: function(convId, sender, message) {
+                const self = this;
+                this.buffer.push({ convId: convId, sender: sender, message: message, ts: Date.now() });
+                if (this.buffer.length >= 20) {
+                    this.flush();
+                } else if (!this.timer) {
+                    this.timer = setTimeout(function() { self.flush(); }, 250);
+                }
+            },
+            
+            flush: function() {
+                clearTimeout(this.timer);
+                this.timer = null;
+                if (!this.db || this.buffer.length === 0) return;
+                const store = this.db.transaction('messages', 'readwrite').objectStore('messages');
+                this.buffer.forEach(function(entry) { store.put(entry); });
+                this.buffer = [];
+            },
+            
+            load: function(convId, limit) {
+                const db = this.db;
+                return new Promise(function(resolve) {
+                    if (!db) return resolve([]);
+                    const rows = [];
+                    const index = db.transaction('messages').objectStore('messages').index('convId');
+                    const request = index.openCursor(IDBKeyRange.only(convId), 'prev');
+                    request.onsuccess = function() {
+                        const cursor = request.result;
+                        if (cursor && rows.length < limit) {
+                            rows.push(cursor.value);
+                            cursor.continue();
+                        } else {
+                            resolve(rows.reverse());
+                        }
+                    };
+                    request.onerror = function() { resolve([]); };
+                });
+            }
+        };
+        
+        // Message of the pending turn, saved together with its reply
+        let pendingMessage = null;
+        
+        // Placeholder bubble the pending reply is written into
+        let replyBubble = null;
+        
+        // Turn state: whether a reply is pending, and the socket it was sent on
+        let inflight = false;
+        let pendingSocket = null;
+        
+        // Collapse bursts (held Enter, double clicks) into one trailing call
+        function debounce(fn, delay) {
+            let timer;
+            return function(...args) {
+                clearTimeout(timer);
+                timer = setTimeout(function() { fn(...args); }, delay);
+            };
+        }
         
         function addMessage(sender, message) {
             const messagesDiv = document.getElementById('chatMessages');
@@ -851,23 +1549,44 @@ def chat_iframe():
             
             const messageBubble = document.createElement('div');
             messageBubble.className = 'message-bubble';
-            messageBubble.innerHTML = message;
+            // Rendered as text: messages are never parsed as HTML
+            messageBubble.textContent = message;
             
             messageDiv.appendChild(messageBubble);
             messagesDiv.appendChild(messageDiv);
+            
+            // Only the most recent window of messages stays in the DOM
+            while (messagesDiv.children.length > HISTORY_LIMIT) {
+                messagesDiv.removeChild(messagesDiv.firstChild);
+            }
             messagesDiv.scrollTop = messagesDiv.scrollHeight;
+            return messageBubble;
         }
         
         function sendMessage() {
             const input = document.getElementById('messageInput');
             const message = input.value.trim();
             
-            if (!message) return;
+            // Drop submissions while a reply is still pending
+            if (!message || inflight) return;
+            ensureSocket();
             
             addMessage('user', message);
             input.value = '';
             
-            addMessage('bot', '💭 Thinking...');
+            replyBubble = addMessage('bot', '💭 Thinking...');
+            inflight = true;
+            pendingMessage = message;
+            
+            if (socket && socket.readyState === WebSocket.OPEN) {
+                pendingSocket = socket;
+                socket.send(JSON.stringify({
+                    type: 'user_message',
+                    message: message,
+                    conversation_id: conversationId
+                }));
+                return;
+            }
             
             fetch('/api/chat', {
                 method: 'POST',
@@ -878,65 +1597,237 @@ def chat_iframe():
                 })
             })
             .then(response => response.json())
-            .then(data => {
-                const messages = document.getElementById('chatMessages');
-                messages.removeChild(messages.lastChild);
+            .then(handleResponse)
+            .catch(handleError);
+        }
+        
+        function handleResponse(data) {
+            inflight = false;
+            pendingSocket = null;
+            
+            // Swap the typing indicator's text for the bot response
+            const reply = data.response;
+            replyBubble.textContent = reply;
+            replyBubble = null;
+            const messages = document.getElementById('chatMessages');
+            messages.scrollTop = messages.scrollHeight;
+            
+            conversationId = data.conversation_id;
+            localStorage.setItem('chat-conversation-id', conversationId);
+            transcript.save(conversationId, 'user', pendingMessage);
+            transcript.save(conversationId, 'bot', reply);
+        }
+        
+        function handleError(error) {
+            inflight = false;
+            pendingSocket = null;
+            
+            if (replyBubble) {
+                replyBubble.textContent = 'Sorry, I encountered an error. Please try again.';
+                replyBubble = null;
+            }
+        }
+        
+        // Persistent connection for chat turns; /api/chat is the fallback. It is opened
+        // only once the chat is used and closed again when idle, since every open
+        // socket holds a server thread
+        const PING_INTERVAL = 25000;
+        const PONG_TIMEOUT = 10000;
+        const MAX_RECONNECT_DELAY = 30000;
+        const MAX_FAILED_CONNECTS = 3;
+        const IDLE_TIMEOUT = 120000;
+        let socket = null;
+        let connecting = false;
+        let reconnectDelay = 1000;
+        let idleTimer = null;
+        // Attempts in a row that never opened; past the limit the chat stays on HTTP
+        let failedConnects = 0;
+        
+        function ensureSocket() {
+            if (!socket && !connecting && failedConnects < MAX_FAILED_CONNECTS) {
+                connectSocket();
+            }
+            touchSocket();
+        }
+        
+        // Restart the idle countdown; when it runs out the socket is closed for good
+        // until the chat is used again
+        function touchSocket() {
+            clearTimeout(idleTimer);
+            idleTimer = setTimeout(function() {
+                if (inflight) return touchSocket();
+                idleTimer = null;
+                if (socket) socket.close();
+            }, IDLE_TIMEOUT);
+        }
+        
+        function connectSocket() {
+            if (!('WebSocket' in window)) return;
+            
+            connecting = true;
+            const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+            const ws = new WebSocket(scheme + location.host + '/ws/chat');
+            let pingTimer = null;
+            let pongTimer = null;
+            let pingSentAt = 0;
+            
+            ws.onopen = function() {
+                connecting = false;
+                socket = ws;
+                reconnectDelay = 1000;
+                failedConnects = 0;
+                touchSocket();
                 
-                conversationId = data.conversation_id;
-                localStorage.setItem('chat-conversation-id', conversationId);
+                // Let the server ready a resumed conversation while the user types
+                if (conversationId) {
+                    ws.send(JSON.stringify({ type: 'warmup', conversation_id: conversationId }));
+                }
                 
-                addMessage('bot', data.response);
-            })
-            .catch(error => {
-                const messages = document.getElementById('chatMessages');
-                messages.removeChild(messages.lastChild);
-                addMessage('bot', 'Sorry, I encountered an error. Please try again.');
-            });
+                // A missing pong means the path is dead; closing triggers a reconnect
+                pingTimer = setInterval(function() {
+                    pingSentAt = Date.now();
+                    ws.send('{"type":"ping"}');
+                    pongTimer = setTimeout(function() { ws.close(); }, PONG_TIMEOUT);
+                }, PING_INTERVAL);
+            };
+            ws.onmessage = function(event) {
+                const data = JSON.parse(event.data);
+                if (data.type === 'pong') {
+                    clearTimeout(pongTimer);
+                    console.debug('Chatbot socket round trip:', Date.now() - pingSentAt, 'ms');
+                    return;
+                }
+                touchSocket();
+                if (data.type === 'bot_response') {
+                    handleResponse(data);
+                } else if (data.type === 'error') {
+                    handleError(data.error);
+                }
+            };
+            ws.onclose = function() {
+                clearInterval(pingTimer);
+                clearTimeout(pongTimer);
+                connecting = false;
+                if (socket === ws) {
+                    socket = null;
+                } else if (++failedConnects >= MAX_FAILED_CONNECTS) {
+                    // The server never accepted a connection; stop retrying
+                    return;
+                }
+                if (pendingSocket === ws) handleError(new Error('Chat connection closed'));
+                
+                // Reconnect with exponential backoff, unless the socket was closed for being idle
+                if (!idleTimer) return;
+                setTimeout(ensureSocket, reconnectDelay);
+                reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY);
+            };
         }
         
-        document.getElementById('sendButton').addEventListener('click', sendMessage);
+        const debouncedSend = debounce(sendMessage, 150);
+        document.getElementById('sendButton').addEventListener('click', debouncedSend);
         document.getElementById('messageInput').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') sendMessage();
+            if (e.key === 'Enter') debouncedSend();
         });
+        // Connect as soon as the user starts typing, so the first turn can use the socket
+        document.getElementById('messageInput').addEventListener('focus', ensureSocket);
         
-        // Initial welcome message
+        // Initial welcome message, then restore the recent transcript
         addMessage('bot', 'Welcome! I can help investors find opportunities and entrepreneurs secure funding. Are you an investor or entrepreneur?');
+        transcript.open().then(function() {
+            if (!conversationId) return;
+            return transcript.load(conversationId, HISTORY_LIMIT).then(function(rows) {
+                rows.forEach(function(row) { addMessage(row.sender, row.message); });
+            });
+        });
+        window.addEventListener('pagehide', function() { transcript.flush(); });
     </script>
 </body>
 </html>
 """
-    return html
+
+_IFRAME_VARIANTS = compress_asset(CHAT_IFRAME_HTML)
+
+@app.route('/chat-iframe')
+def chat_iframe():
+    """Standalone chat interface for iframe embedding"""
+    response = static_asset_response(_IFRAME_VARIANTS, 'text/html; charset=utf-8')
+    # Shared caches would hand first-time visitors a copy without the affinity
+    # cookie; revalidating against the ETag still spares the body
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return set_affinity_cookie(response)
 
 # WebSocket support (basic implementation)
+def handle_webhook_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Dispatch a single webhook event"""
+    event_type = event.get('event_type')
+    payload = event.get('payload', {})
+    
+    if event_type == 'message':
+        return chatbot.process_message(
+            payload.get('message', ''),
+            payload.get('conversation_id')
+        )
+    
+    return {'status': 'received', 'event_type': event_type}
+
+# Single non-message events are acknowledged straight from the raw body, when it
+# is one object that opens with its event_type
+_EVENT_TYPE_RE = re.compile(rb'\A\s*\{\s*"event_type"\s*:\s*"([^"\\]*)"\s*(?:,|\})')
+
+@functools.lru_cache(maxsize=256)
+def _received_body(event_type: bytes) -> bytes:
+    """Encode the acknowledgement for a non-message event type"""
+    return orjson.dumps({'status': 'received', 'event_type': event_type.decode('utf-8', 'replace')})
+
 @app.route('/webhook', methods=['POST'])
 def webhook_endpoint():
     """Webhook endpoint for external integrations"""
+    raw = request.get_data(cache=False)
+    
+    # A single event with no "message" string (or escape that could spell one)
+    # only needs an acknowledgement, so it is answered without parsing the body
+    if (b'"message"' not in raw and b'\\' not in raw and b'"events"' not in raw
+            and raw.count(b'"event_type"') == 1 and raw.rstrip().endswith(b'}')):
+        match = _EVENT_TYPE_RE.match(raw)
+        if match:
+            return json_bytes_response(_received_body(match.group(1)))
+    
     try:
-        data = request.json
-        event_type = data.get('event_type')
-        payload = data.get('payload', {})
-        
-        if event_type == 'message':
-            response = chatbot.process_message(
-                payload.get('message', ''),
-                payload.get('conversation_id')
-            )
-            return jsonify(response)
-        
-        return jsonify({'status': 'received', 'event_type': event_type})
+        data = orjson.loads(raw)
+        if not isinstance(data, (dict, list)):
+            return json_response({'error': 'Body must be an event object or a list of events'}, 400)
+        
+        # Batches arrive as a bare list or under 'events'; one result per event
+        if isinstance(data, list) or 'events' in data:
+            events = data if isinstance(data, list) else data['events']
+            if not isinstance(events, list):
+                return json_response({'error': 'events must be a list'}, 400)
+            results = []
+            for event in events:
+                try:
+                    results.append(handle_webhook_event(event))
+                except Exception as e:
+                    results.append({'error': str(e)})
+            return json_response({'results': results})
+        
+        return json_response(handle_webhook_event(data))
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 if __name__ == '__main__':
+    # Development server only; production runs under gunicorn (see Procfile)
+    port = int(os.environ.get('PORT', 8080))
     print("🚀 Investor-Entrepreneur Chatbot Server Starting...")
-    print("📡 REST API available at: http://localhost:8080/api/chat")
-    print("🔗 JavaScript Widget: http://localhost:8080/widget.js")
-    print("🖼️ Iframe Embed: http://localhost:8080/chat-iframe")
-    print("🔗 Webhook URL: http://localhost:8080/webhook")
+    print(f"📡 REST API available at: http://localhost:{port}/api/chat")
+    print(f"🔌 WebSocket chat: ws://localhost:{port}/ws/chat")
+    print(f"🔗 JavaScript Widget: http://localhost:{port}/widget.js")
+    print(f"🖼️ Iframe Embed: http://localhost:{port}/chat-iframe")
+    print(f"🔗 Webhook URL: http://localhost:{port}/webhook")
     print("\n📋 Integration Examples:")
     print("• REST API: Use /api/chat endpoint from any framework")
     print("• Widget: Add <script src='http://your-domain.com/widget.js'></script>")
     print("• Iframe: <iframe src='http://your-domain.com/chat-iframe'></iframe>")
     
-    app.run(debug=True, host='0.0.0.0', port=8080)   
\ No newline at end of file
+    # The debugger and reloader are opt-in with DEV=1
+    app.run(debug=bool(os.environ.get('DEV')), host='0.0.0.0', port=port, threaded=True)